@@ -13,6 +13,7 @@ export async function POST(request: NextRequest) {
       useCase,
       interests,
       referralSource,
+      referredBy,
       newsletter
     } = body;
 
@@ -30,6 +31,10 @@ export async function POST(request: NextRequest) {
                      'unknown';
     const userAgent = request.headers.get('user-agent') || '';
 
+    // Referrer from the ?ref= share link, keyed like the referral ranking;
+    // the database drops it unless it names another member
+    const referrer = typeof referredBy === 'string' ? referredBy.trim().toLowerCase() : '';
+
     // Insert into waitlist
     const { data, error } = await supabase
       .from('waitlist')
@@ -42,6 +47,7 @@ export async function POST(request: NextRequest) {
         use_case: useCase,
         interests,
         referral_source: referralSource,
+        referred_by: referrer && referrer !== email.trim().toLowerCase() ? referrer : null,
         newsletter_consent: newsletter,
         ip_address: clientIP,
         user_agent: userAgent
@@ -17,10 +17,12 @@ type TestResult = {
   output: string;
   latency_ms: number;
   cost_usd: number;
-  accuracy_score: number;
+  accuracy_score: number | null;
   timestamp: string;
 };
 
+const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+
 type Agent = {
   id: string;
   name: string;
@@ -102,24 +104,23 @@ export default function TestPage() {
     setLoading(true);
     
     try {
-      // Simulate API call to backend
-      await new Promise(resolve => setTimeout(resolve, 2000));
-      
-      // Mock test result
-      const mockResult: TestResult = {
-        output: selectedAgent.id === '1' 
-          ? 'This is a concise summary of the provided text, highlighting the key points and main ideas while maintaining the essential information.'
-          : selectedAgent.id === '2'
-          ? 'Positive sentiment detected (confidence: 94.2%)'
-          : 'A detailed caption describing the visual elements and context of the uploaded image.',
-        latency_ms: Math.floor(Math.random() * 800) + 200,
-        cost_usd: parseFloat((Math.random() * 0.01).toFixed(4)),
-        accuracy_score: Math.floor(Math.random() * 20) + 80,
-        timestamp: new Date().toISOString()
-      };
+      const response = await fetch(`${API_URL}/test`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          agent_id: selectedAgent.id,
+          input_data: input
+        })
+      });
+
+      if (!response.ok) {
+        throw new Error(`Test request failed with status ${response.status}`);
+      }
+
+      const result: TestResult = await response.json();
 
-      setTestResult(mockResult);
-      setTestHistory(prev => [mockResult, ...prev.slice(0, 4)]);
+      setTestResult(result);
+      setTestHistory(prev => [result, ...prev.slice(0, 4)]);
       toast.success('Test completed successfully!');
     } catch (error) {
       toast.error('Test failed. Please try again.');
@@ -283,9 +284,14 @@ export default function TestPage() {
                               <Star className="h-4 w-4" />
                               <span className="text-sm">Accuracy</span>
                             </div>
-                            <span className="font-semibold">{testResult.accuracy_score}%</span>
+                            <span className="font-semibold">
+                              {testResult.accuracy_score === null ? 'N/A' : `${testResult.accuracy_score}%`}
+                            </span>
                           </div>
-                          <Progress value={testResult.accuracy_score} className="h-2" />
+                          <Progress value={testResult.accuracy_score ?? 0} className="h-2" />
+                          <p className="text-xs text-muted-foreground mt-1">
+                            Measured on the agent&apos;s sample input
+                          </p>
                         </div>
                       </div>
                     </div>
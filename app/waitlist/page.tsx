@@ -132,12 +132,18 @@ export default function WaitlistPage() {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [isSubmitted, setIsSubmitted] = useState(false);
   const [position, setPosition] = useState<number | null>(null);
+  const [referredBy, setReferredBy] = useState<string | null>(null);
 
   // Refs for animations
   const heroRef = useRef<HTMLElement>(null);
   const formRef = useRef<HTMLDivElement>(null);
   const statsRef = useRef<HTMLDivElement>(null);
 
+  useEffect(() => {
+    // Referral links look like /waitlist?ref=<referrer email>
+    setReferredBy(new URLSearchParams(window.location.search).get('ref'));
+  }, []);
+
   useEffect(() => {
     // Hero section animations
     if (heroRef.current) {
@@ -224,7 +230,7 @@ export default function WaitlistPage() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify(formData)
+        body: JSON.stringify({ ...formData, referredBy })
       });
 
       const result = await response.json();
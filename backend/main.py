@@ -9,12 +9,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import time
-import random
-import asyncio
 import json
 import hashlib
 from datetime import datetime
 
+from metrics import StageRecorder, AccuracyTracker, pricing_for, count_tokens, NS_PER_MS
+
 app = FastAPI(
     title="AI Agent Marketplace API",
     description="Backend API for AI agent testing and inference",
@@ -38,9 +38,9 @@ class TestRequest(BaseModel):
 
 class TestResponse(BaseModel):
     output: str
-    latency_ms: int
+    latency_ms: float
     cost_usd: float
-    accuracy_score: int
+    accuracy_score: Optional[int] = None
     timestamp: str
     metadata: Dict[str, Any]
 
@@ -53,27 +53,35 @@ class AgentMetadata(BaseModel):
     description: str
 
 # Mock AI models for demonstration
+# sample_input/sample_output mirror the agents seed rows in
+# supabase/migrations/20250623184359_bold_tower.sql; keep them in sync
 MOCK_AGENTS = {
     "1": {
         "name": "Text Summarizer Pro",
         "category": "Text Processing",
         "language": "Python",
         "description": "Advanced text summarization using BART-Large-CNN",
-        "model_type": "summarization"
+        "model_type": "summarization",
+        "sample_input": "Long news article or document text that needs to be summarized into a shorter, more digestible format while preserving the key information and main points.",
+        "sample_output": "Concise, accurate summary preserving key information and main ideas from the original text in a structured format."
     },
     "2": {
         "name": "Sentiment Analyzer",
         "category": "Text Processing", 
         "language": "Python",
         "description": "Real-time sentiment analysis",
-        "model_type": "sentiment"
+        "model_type": "sentiment",
+        "sample_input": "I love this product! It works perfectly and exceeded my expectations. The quality is amazing.",
+        "sample_output": "Positive sentiment detected (confidence: 92.4%) - Strong positive emotional indicators found in text."
     },
     "3": {
         "name": "Image Caption Generator",
         "category": "Image Analysis",
         "language": "Python", 
         "description": "Generate captions for images",
-        "model_type": "image_caption"
+        "model_type": "image_caption",
+        "sample_input": "[Image upload - person riding bicycle through city street]",
+        "sample_output": "A person wearing casual clothing rides a blue bicycle through a busy city street during daytime, with buildings and pedestrians visible in the background."
     }
 }
 
@@ -127,49 +135,83 @@ def mock_image_caption(input_data: str) -> str:
     
     return f"Caption: {captions[caption_index]}. This image shows detailed visual elements with good composition and lighting."
 
+accuracy_tracker = AccuracyTracker()
+
+# Stages that serve the request and are billed
+BILLED_STAGES = ("preprocess", "inference", "postprocess")
+
+def score_agent_accuracy(agent_id: str) -> Optional[int]:
+    """Score an agent against its sample_input/sample_output pair (cached)"""
+    agent = MOCK_AGENTS[agent_id]
+    return accuracy_tracker.score(
+        agent_id, agent, lambda sample: run_model(agent["model_type"], sample)
+    )
+
+def run_model(model_type: str, input_data: str) -> str:
+    """Dispatch input to the model implementation for its type"""
+    if model_type == "summarization":
+        return mock_text_summarization(input_data)
+    elif model_type == "sentiment":
+        return mock_sentiment_analysis(input_data)
+    elif model_type == "image_caption":
+        return mock_image_caption(input_data)
+    else:
+        return f"Processed input: {input_data[:100]}..."
+
 async def simulate_model_inference(agent_id: str, input_data: str) -> Dict[str, Any]:
-    """Simulate AI model inference with realistic delays"""
+    """Run model inference and measure its latency, cost and accuracy"""
     
     if agent_id not in MOCK_AGENTS:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     agent = MOCK_AGENTS[agent_id]
+    started_ns = time.perf_counter_ns()
+    recorder = StageRecorder()
     
-    # Simulate processing time based on model type
-    processing_times = {
-        "summarization": (300, 600),  # 300-600ms
-        "sentiment": (100, 250),      # 100-250ms  
-        "image_caption": (600, 1200)  # 600-1200ms
-    }
+    with recorder.stage("preprocess"):
+        model_input = input_data.strip()
+        input_tokens = count_tokens(model_input)
     
-    min_time, max_time = processing_times.get(agent["model_type"], (200, 400))
-    latency = random.randint(min_time, max_time)
+    with recorder.stage("inference"):
+        output = run_model(agent["model_type"], model_input)
     
-    # Simulate actual processing delay
-    await asyncio.sleep(latency / 1000.0)
+    with recorder.stage("postprocess"):
+        output_tokens = count_tokens(output)
     
-    # Generate output based on model type
-    if agent["model_type"] == "summarization":
-        output = mock_text_summarization(input_data)
-    elif agent["model_type"] == "sentiment":
-        output = mock_sentiment_analysis(input_data)
-    elif agent["model_type"] == "image_caption":
-        output = mock_image_caption(input_data)
-    else:
-        output = f"Processed input: {input_data[:100]}..."
+    # Latency is the whole request; cost covers only the billed compute
+    latency_ms = (time.perf_counter_ns() - started_ns) / NS_PER_MS
+    compute_ms = sum(recorder.wall_ms(name) for name in BILLED_STAGES)
+    pricing = pricing_for(agent)
+    cost_usd = pricing.cost(input_tokens, output_tokens, compute_ms)
     
-    # Calculate mock metrics
-    cost_usd = random.uniform(0.0001, 0.005)
-    accuracy_score = random.randint(75, 98)
+    # Per-agent score against its sample pair, not the user input; scored at
+    # startup so the reference run never lands in a request's latency
+    accuracy_score = score_agent_accuracy(agent_id)
     
     return {
         "output": output,
-        "latency_ms": latency,
+        "latency_ms": round(latency_ms, 3),
         "cost_usd": round(cost_usd, 6),
         "accuracy_score": accuracy_score,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "measurements": {
+            "cpu_ms": round(recorder.cpu_ms(), 3),
+            "billed_ms": round(compute_ms, 3),
+            "stages": recorder.to_dict(),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "accuracy_basis": "agent_sample",
+            "pricing_unit": pricing.unit,
+            "pricing_rate_usd": pricing.rate_usd
+        }
     }
 
+@app.on_event("startup")
+async def score_agents():
+    """Score every agent's sample pair before serving requests"""
+    for agent_id in MOCK_AGENTS:
+        score_agent_accuracy(agent_id)
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -217,6 +259,7 @@ async def test_agent(request: TestRequest):
         
         # Add metadata
         result["metadata"] = {
+            **result.pop("measurements"),
             "agent_id": request.agent_id,
             "agent_name": MOCK_AGENTS.get(request.agent_id, {}).get("name", "Unknown"),
             "input_length": len(request.input_data),
@@ -256,15 +299,16 @@ async def benchmark_agent(agent_id: str, background_tasks: BackgroundTasks):
     
     # Calculate aggregate metrics
     avg_latency = sum(r["latency_ms"] for r in benchmark_results) / len(benchmark_results)
+    avg_cpu = sum(r["measurements"]["cpu_ms"] for r in benchmark_results) / len(benchmark_results)
     avg_cost = sum(r["cost_usd"] for r in benchmark_results) / len(benchmark_results)
-    avg_accuracy = sum(r["accuracy_score"] for r in benchmark_results) / len(benchmark_results)
     
     return {
         "agent_id": agent_id,
         "benchmark_summary": {
-            "average_latency_ms": round(avg_latency, 2),
+            "average_latency_ms": round(avg_latency, 3),
+            "average_cpu_ms": round(avg_cpu, 3),
             "average_cost_usd": round(avg_cost, 6),
-            "average_accuracy": round(avg_accuracy, 2),
+            "sample_accuracy": score_agent_accuracy(agent_id),
             "total_tests": len(benchmark_results)
         },
         "detailed_results": benchmark_results,
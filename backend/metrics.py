@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Inference Metrics for AI Agent Marketplace
+Measures stage timings, computes per-agent cost and sample-based accuracy
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Callable
+from difflib import SequenceMatcher
+import time
+
+NS_PER_MS = 1_000_000
+
+@dataclass
+class StageTiming:
+    wall_ns: int = 0
+    cpu_ns: int = 0
+
+    @property
+    def wall_ms(self) -> float:
+        return self.wall_ns / NS_PER_MS
+
+    @property
+    def cpu_ms(self) -> float:
+        return self.cpu_ns / NS_PER_MS
+
+class _Stage:
+    """Context manager that adds one stage's wall and CPU time to a recorder"""
+
+    def __init__(self, recorder: "StageRecorder", name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter_ns()
+        self.cpu_start = time.process_time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        timing = self.recorder.stages.setdefault(self.name, StageTiming())
+        timing.wall_ns += time.perf_counter_ns() - self.wall_start
+        timing.cpu_ns += time.process_time_ns() - self.cpu_start
+        return False
+
+@dataclass
+class StageRecorder:
+    """Collects wall-clock and CPU time per named stage of a request"""
+    stages: Dict[str, StageTiming] = field(default_factory=dict)
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def wall_ms(self, name: Optional[str] = None) -> float:
+        if name is not None:
+            return self.stages[name].wall_ms if name in self.stages else 0.0
+        return sum(t.wall_ms for t in self.stages.values())
+
+    def cpu_ms(self, name: Optional[str] = None) -> float:
+        if name is not None:
+            return self.stages[name].cpu_ms if name in self.stages else 0.0
+        return sum(t.cpu_ms for t in self.stages.values())
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "wall_ms": round(t.wall_ms, 3),
+                "cpu_ms": round(t.cpu_ms, 3)
+            }
+            for name, t in self.stages.items()
+        }
+
+@dataclass(frozen=True)
+class PricingModel:
+    """Cost per execution, billed either per token or per millisecond of compute"""
+    unit: str  # "token" or "ms"
+    rate_usd: float
+    minimum_usd: float = 0.0
+
+    def cost(self, input_tokens: int, output_tokens: int, compute_ms: float) -> float:
+        if self.unit == "token":
+            billable = input_tokens + output_tokens
+        elif self.unit == "ms":
+            billable = compute_ms
+        else:
+            raise ValueError(f"Unknown pricing unit: {self.unit}")
+        return max(billable * self.rate_usd, self.minimum_usd)
+
+# Default pricing per model type; agents may override with their own "pricing"
+PRICING_MODELS: Dict[str, PricingModel] = {
+    "summarization": PricingModel(unit="token", rate_usd=0.000002),
+    "sentiment": PricingModel(unit="token", rate_usd=0.0000005),
+    "image_caption": PricingModel(unit="ms", rate_usd=0.00001, minimum_usd=0.0001),
+}
+DEFAULT_PRICING = PricingModel(unit="ms", rate_usd=0.000005)
+
+def pricing_for(agent: Dict[str, Any]) -> PricingModel:
+    """Resolve the pricing model for an agent, preferring its own override"""
+    return agent.get("pricing") or PRICING_MODELS.get(agent.get("model_type"), DEFAULT_PRICING)
+
+def count_tokens(text: str) -> int:
+    """Approximate token count using whitespace-delimited words"""
+    return len(text.split())
+
+def similarity_score(output: str, expected: str) -> int:
+    """Score 0-100 of how closely output matches the expected text"""
+    if not expected:
+        return 0
+    ratio = SequenceMatcher(None, output.strip().lower(), expected.strip().lower()).ratio()
+    return int(round(ratio * 100))
+
+class AccuracyTracker:
+    """Scores each agent against its sample_input/sample_output pair.
+
+    Scores are cached per agent and invalidated when the sample pair changes,
+    so the reference run happens once rather than on every request.
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, tuple] = {}
+
+    def score(self, agent_id: str, agent: Dict[str, Any], run: Callable[[str], str]) -> Optional[int]:
+        sample_input = agent.get("sample_input") or ""
+        sample_output = agent.get("sample_output") or ""
+        if not sample_input or not sample_output:
+            return None
+
+        key = (sample_input, sample_output)
+        cached = self._scores.get(agent_id)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        accuracy = similarity_score(run(sample_input), sample_output)
+        self._scores[agent_id] = (key, accuracy)
+        return accuracy
+
+    def invalidate(self, agent_id: Optional[str] = None):
+        if agent_id is None:
+            self._scores.clear()
+        else:
+            self._scores.pop(agent_id, None)
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Referral Ranking for AI Nexus Waitlist
+Attributes signups to referrers and keeps waitlist order and the referral
+leaderboard in indexable skip lists so both are served in O(log n)
+"""
+
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import random
+
+# Spots a member moves up for each person who joins with their referral link
+REFERRAL_BOOST = 3
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * level
+        # width[i] is how many bottom-level steps next[i] is ahead of this node
+        self.width: List[int] = [1] * level
+
+class IndexableSkipList:
+    """Sorted set of unique keys with O(log n) insert, remove and rank"""
+
+    MAX_LEVEL = 32
+
+    def __init__(self, seed: Optional[int] = None):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        node = self._head.next[0]
+        while node:
+            yield node.key
+            node = node.next[0]
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key):
+        update = [self._head] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._level)):
+            rank[i] = rank[i + 1] if i + 1 < self._level else 0
+            while node.next[i] and node.next[i].key < key:
+                rank[i] += node.width[i]
+                node = node.next[i]
+            update[i] = node
+
+        if node.next[0] and node.next[0].key == key:
+            raise KeyError(f"Duplicate key: {key!r}")
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                self._head.width[i] = self._size + 1
+            self._level = level
+
+        new_node = _Node(key, level)
+        for i in range(level):
+            new_node.next[i] = update[i].next[i]
+            update[i].next[i] = new_node
+            new_node.width[i] = update[i].width[i] - (rank[0] - rank[i])
+            update[i].width[i] = rank[0] - rank[i] + 1
+
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+
+        self._size += 1
+
+    def remove(self, key):
+        update = [self._head] * self.MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+
+        for i in range(self._level):
+            if update[i].next[i] is target:
+                update[i].width[i] += target.width[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].width[i] -= 1
+
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def rank(self, key) -> int:
+        """Zero-based index of key in sorted order"""
+        node = self._head
+        index = 0
+        for i in reversed(range(self._level)):
+            while node.next[i] and node.next[i].key < key:
+                index += node.width[i]
+                node = node.next[i]
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        return index
+
+    def first(self, n: int) -> List:
+        keys = []
+        node = self._head.next[0]
+        while node and len(keys) < n:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class ReferralRanking:
+    """Waitlist order and referral leaderboard, updated incrementally per join.
+
+    A member's effective position orders by ``position - boost * referrals``;
+    ties go to the member with more referrals, so each referral moves a
+    member ahead of the one ``boost`` places in front of them. Membership is rebuilt on ``start``
+    from the waitlist table's ``referred_by`` column and refreshed
+    periodically, so joins written by other workers or the ``/api/waitlist``
+    route are picked up; referral counts are upserted to ``waitlist_referrals``
+    on the same schedule.
+    """
+
+    def __init__(
+        self,
+        client,
+        boost: int = REFERRAL_BOOST,
+        persist_interval_ms: int = 5000,
+        refresh_overlap_s: int = 60
+    ):
+        self.client = client
+        self.boost = boost
+        self.persist_interval = persist_interval_ms / 1000.0
+        # Rows committed slightly out of created_at order are re-read
+        self.refresh_overlap = timedelta(seconds=refresh_overlap_s)
+
+        self._members: Dict[str, Dict[str, Any]] = {}
+        # Every signup attributed to a referrer, including referrers not
+        # loaded yet; those are credited once the referrer is added
+        self._referred: Dict[str, set] = {}
+        self._queue = IndexableSkipList()
+        self._leaderboard = IndexableSkipList()
+        self._dirty: set = set()
+        self._watermark: Optional[str] = None
+        self._persist_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def normalize(email: Optional[str]) -> Optional[str]:
+        if not email:
+            return None
+        return email.strip().lower() or None
+
+    def _queue_key(self, key: str) -> Tuple[int, int, int, str]:
+        member = self._members[key]
+        return (
+            member["position"] - self.boost * member["referrals"],
+            -member["referrals"],
+            member["position"],
+            key
+        )
+
+    def _leaderboard_key(self, key: str) -> Tuple[int, int, str]:
+        member = self._members[key]
+        return (-member["referrals"], member["position"], key)
+
+    async def resolve_referrer(self, referred_by: Optional[str], email: str) -> Optional[str]:
+        """Return the normalized referrer to attribute a signup to, if they are on the waitlist"""
+        referrer = self.normalize(referred_by)
+        if referrer is None or referrer == self.normalize(email):
+            return None
+        if referrer in self._members:
+            return referrer
+
+        # Joined through another writer since our last refresh
+        loop = asyncio.get_running_loop()
+        exists = await loop.run_in_executor(None, self._member_exists, referrer)
+        return referrer if exists else None
+
+    def _member_exists(self, email: str) -> bool:
+        result = self.client.rpc('waitlist_member_exists', {'candidate': email}).execute()
+        return bool(result.data)
+
+    def add_member(
+        self,
+        email: str,
+        position: int,
+        referrer: Optional[str] = None,
+        joined_at: Optional[str] = None
+    ) -> int:
+        """Add a member, credit their referrer and return the member's effective position"""
+        key = self.normalize(email)
+        if key not in self._members:
+            self._members[key] = {
+                "email": email,
+                "position": position,
+                "referrals": 0,
+                "referred_by": None,
+                "joined_at": joined_at or datetime.utcnow().isoformat()
+            }
+            self._queue.insert(self._queue_key(key))
+            referrer = self.normalize(referrer)
+            if referrer and referrer != key:
+                self._members[key]["referred_by"] = referrer
+                self._referred.setdefault(referrer, set()).add(key)
+                if referrer in self._members:
+                    self._credit(referrer, 1)
+            if self._referred.get(key):
+                # Signups that named this member before they were loaded
+                self._credit(key, len(self._referred[key]))
+        return self.effective_position(key)
+
+    def remove_member(self, email: str):
+        """Remove a member and take back the credit their referrer got for them"""
+        key = self.normalize(email)
+        if key not in self._members:
+            return
+
+        self._queue.remove(self._queue_key(key))
+        if self._members[key]["referrals"]:
+            self._leaderboard.remove(self._leaderboard_key(key))
+        referrer = self._members.pop(key)["referred_by"]
+        self._dirty.discard(key)
+        if referrer:
+            referred = self._referred[referrer]
+            referred.discard(key)
+            if not referred:
+                del self._referred[referrer]
+            if referrer in self._members:
+                self._credit(referrer, -1)
+
+    def _credit(self, referrer: str, delta: int):
+        self._queue.remove(self._queue_key(referrer))
+        if self._members[referrer]["referrals"]:
+            self._leaderboard.remove(self._leaderboard_key(referrer))
+
+        self._members[referrer]["referrals"] += delta
+        self._queue.insert(self._queue_key(referrer))
+        if self._members[referrer]["referrals"]:
+            self._leaderboard.insert(self._leaderboard_key(referrer))
+        self._dirty.add(referrer)
+
+    def get_member(self, email: str) -> Optional[Dict[str, Any]]:
+        key = self.normalize(email)
+        if key not in self._members:
+            return None
+        return {**self._members[key], "effective_position": self.effective_position(key)}
+
+    def effective_position(self, email: str) -> Optional[int]:
+        key = self.normalize(email)
+        if key not in self._members:
+            return None
+        return self._queue.rank(self._queue_key(key)) + 1
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        """Top referrers, most referrals first"""
+        return [
+            {
+                "rank": i + 1,
+                "email": self._members[key]["email"],
+                "referrals": self._members[key]["referrals"],
+                "effective_position": self.effective_position(key)
+            }
+            for i, (_, _, key) in enumerate(self._leaderboard.first(n))
+        ]
+
+    async def start(self):
+        """Rebuild rankings from the table and start periodic refresh and persistence"""
+        await self.refresh()
+        self._persist_task = asyncio.create_task(self._persist_loop())
+
+    async def refresh(self):
+        """Add members that joined since the last refresh, whichever writer inserted them"""
+        since = None
+        if self._watermark:
+            since = (datetime.fromisoformat(self._watermark) - self.refresh_overlap).isoformat()
+
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, self._fetch_members, since)
+
+        # Applied on the event loop so rankings are never mutated concurrently
+        for row in rows:
+            self.add_member(
+                row['email'],
+                row.get('position') or 0,
+                row.get('referred_by'),
+                row.get('created_at')
+            )
+            if row.get('created_at') and (self._watermark is None or row['created_at'] > self._watermark):
+                self._watermark = row['created_at']
+
+    async def stop(self):
+        if self._persist_task:
+            self._persist_task.cancel()
+            try:
+                await self._persist_task
+            except asyncio.CancelledError:
+                pass
+            self._persist_task = None
+        await self.persist()
+
+    async def persist(self):
+        """Upsert referral counts changed since the last persist, keyed like waitlist.referred_by"""
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        now = datetime.utcnow().isoformat()
+        rows = [
+            {
+                "referrer_email": key,
+                "referral_count": self._members[key]["referrals"],
+                "updated_at": now
+            }
+            for key in dirty
+        ]
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._upsert_counts, rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Referral refresh error: {str(e)}")
+            try:
+                await self.persist()
+            except Exception as e:
+                print(f"Referral persist error: {str(e)}")
+
+    def _upsert_counts(self, rows: List[Dict[str, Any]]):
+        self.client.table('waitlist_referrals').upsert(
+            rows, on_conflict="referrer_email"
+        ).execute()
+
+    def _fetch_members(self, since: Optional[str] = None, page_size: int = 1000) -> List[Dict[str, Any]]:
+        rows = []
+        start = 0
+        while True:
+            query = self.client.table('waitlist').select('email, position, referred_by, created_at')
+            if since:
+                query = query.gte('created_at', since)
+            # Position is unique, so pages stay stable while rows are appended
+            result = query.order('position').range(
+                start, start + page_size - 1
+            ).execute()
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        return rows
@@ -0,0 +1,78 @@
+from metrics import (
+    StageRecorder, PricingModel, AccuracyTracker, pricing_for, similarity_score,
+    PRICING_MODELS, DEFAULT_PRICING
+)
+import pytest
+import time
+
+def test_stage_recorder_times_each_stage():
+    recorder = StageRecorder()
+    with recorder.stage("sleep"):
+        time.sleep(0.01)
+    with recorder.stage("spin"):
+        sum(range(10000))
+
+    assert recorder.wall_ms("sleep") >= 10
+    # Sleeping uses wall time but almost no CPU
+    assert recorder.cpu_ms("sleep") < recorder.wall_ms("sleep")
+    assert recorder.wall_ms() == pytest.approx(recorder.wall_ms("sleep") + recorder.wall_ms("spin"))
+    assert recorder.wall_ms("missing") == 0.0
+    assert set(recorder.to_dict()) == {"sleep", "spin"}
+
+def test_stage_recorder_accumulates_repeated_stages():
+    recorder = StageRecorder()
+    for _ in range(2):
+        with recorder.stage("sleep"):
+            time.sleep(0.005)
+    assert recorder.wall_ms("sleep") >= 10
+
+def test_token_pricing_bills_input_and_output_tokens():
+    pricing = PricingModel(unit="token", rate_usd=0.001)
+    assert pricing.cost(10, 5, compute_ms=1000) == pytest.approx(0.015)
+
+def test_ms_pricing_bills_compute_time():
+    pricing = PricingModel(unit="ms", rate_usd=0.001)
+    assert pricing.cost(10, 5, compute_ms=2.5) == pytest.approx(0.0025)
+
+def test_pricing_applies_minimum():
+    pricing = PricingModel(unit="ms", rate_usd=0.001, minimum_usd=0.01)
+    assert pricing.cost(0, 0, compute_ms=0.5) == 0.01
+
+def test_pricing_rejects_unknown_unit():
+    with pytest.raises(ValueError):
+        PricingModel(unit="request", rate_usd=0.001).cost(1, 1, 1.0)
+
+def test_pricing_for_prefers_agent_override():
+    override = PricingModel(unit="ms", rate_usd=1.0)
+    assert pricing_for({"model_type": "sentiment"}) is PRICING_MODELS["sentiment"]
+    assert pricing_for({"model_type": "sentiment", "pricing": override}) is override
+    assert pricing_for({"model_type": "unknown"}) is DEFAULT_PRICING
+
+def test_similarity_score():
+    assert similarity_score("Same Text", "same text") == 100
+    assert similarity_score("anything", "") == 0
+
+def test_accuracy_tracker_caches_until_sample_changes():
+    calls = []
+    def run(sample):
+        calls.append(sample)
+        return sample.upper()
+
+    tracker = AccuracyTracker()
+    agent = {"sample_input": "hello", "sample_output": "HELLO"}
+    assert tracker.score("1", agent, run) == 100
+    assert tracker.score("1", agent, run) == 100
+    assert calls == ["hello"]
+
+    # A new sample pair invalidates the cached score
+    changed = {"sample_input": "bye", "sample_output": "BYE"}
+    assert tracker.score("1", changed, run) == 100
+    assert calls == ["hello", "bye"]
+
+    tracker.invalidate("1")
+    tracker.score("1", changed, run)
+    assert calls == ["hello", "bye", "bye"]
+
+def test_accuracy_tracker_skips_agents_without_samples():
+    tracker = AccuracyTracker()
+    assert tracker.score("1", {"sample_input": "x"}, lambda s: s) is None
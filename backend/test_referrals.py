@@ -0,0 +1,146 @@
+from referrals import IndexableSkipList, ReferralRanking, REFERRAL_BOOST
+from types import SimpleNamespace
+import asyncio
+import random
+import bisect
+
+class StubClient:
+    """Waitlist rows written by other writers, as seen through the supabase client"""
+
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+
+    def rpc(self, name, params):
+        exists = any(r['email'].lower() == params['candidate'] for r in self.rows)
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=exists))
+
+    def table(self, name):
+        client = self
+
+        class Query:
+            def __init__(self):
+                self.result = sorted(client.rows, key=lambda r: r['position'])
+
+            def select(self, columns):
+                return self
+
+            def gte(self, column, value):
+                self.result = [r for r in self.result if r[column] >= value]
+                return self
+
+            def order(self, column):
+                return self
+
+            def range(self, start, end):
+                self.result = self.result[start:end + 1]
+                return self
+
+            def execute(self):
+                return SimpleNamespace(data=self.result)
+
+        return Query()
+
+def make_ranking(size):
+    ranking = ReferralRanking(client=None)
+    for position in range(1, size + 1):
+        ranking.add_member(f"user{position}@example.com", position)
+    return ranking
+
+def refer(ranking, referrer, index):
+    email = f"friend{index}@example.com"
+    ranking.add_member(email, 1000 + index, asyncio.run(ranking.resolve_referrer(referrer, email)))
+
+def test_each_referral_moves_up_boost_spots():
+    ranking = make_ranking(10)
+    referrer = "user10@example.com"
+
+    refer(ranking, referrer, 1)
+    assert ranking.effective_position(referrer) == 10 - REFERRAL_BOOST
+
+    refer(ranking, referrer, 2)
+    assert ranking.effective_position(referrer) == 10 - 2 * REFERRAL_BOOST
+
+    # Members passed by the referrer each drop one place
+    assert ranking.effective_position("user4@example.com") == 5
+
+def test_referral_near_front_stops_at_first_place():
+    ranking = make_ranking(5)
+    refer(ranking, "user2@example.com", 1)
+    assert ranking.effective_position("user2@example.com") == 1
+
+def test_referrer_is_matched_case_insensitively():
+    ranking = make_ranking(3)
+    refer(ranking, "USER3@Example.com", 1)
+    assert ranking.get_member("user3@example.com")["referrals"] == 1
+    assert asyncio.run(ranking.resolve_referrer("user3@example.com", "user3@example.com")) is None
+
+def test_leaderboard_orders_by_referrals():
+    ranking = make_ranking(5)
+    refer(ranking, "user5@example.com", 1)
+    refer(ranking, "user5@example.com", 2)
+    refer(ranking, "user2@example.com", 3)
+
+    top = ranking.top(10)
+    assert [item["email"] for item in top] == ["user5@example.com", "user2@example.com"]
+    assert [item["referrals"] for item in top] == [2, 1]
+
+def test_remove_member_takes_back_referral_credit():
+    ranking = make_ranking(10)
+    refer(ranking, "user10@example.com", 1)
+    ranking.remove_member("friend1@example.com")
+
+    assert ranking.get_member("user10@example.com")["referrals"] == 0
+    assert ranking.effective_position("user10@example.com") == 10
+    assert ranking.top(10) == []
+
+def test_referrer_from_another_writer_is_looked_up():
+    client = StubClient([{'email': 'Other@example.com', 'position': 7}])
+    ranking = ReferralRanking(client)
+
+    assert asyncio.run(ranking.resolve_referrer("other@example.com", "new@example.com")) == "other@example.com"
+    assert asyncio.run(ranking.resolve_referrer("nobody@example.com", "new@example.com")) is None
+
+def test_referral_is_credited_when_referrer_is_loaded_later():
+    ranking = make_ranking(3)
+    ranking.add_member("friend1@example.com", 100, "late@example.com")
+    ranking.add_member("late@example.com", 50)
+
+    assert ranking.get_member("late@example.com")["referrals"] == 1
+    ranking.remove_member("friend1@example.com")
+    assert ranking.get_member("late@example.com")["referrals"] == 0
+
+def test_refresh_picks_up_rows_from_other_writers():
+    client = StubClient([
+        {'email': 'a@example.com', 'position': 1, 'referred_by': None, 'created_at': '2025-10-19T10:00:00+00:00'}
+    ])
+    ranking = ReferralRanking(client)
+    asyncio.run(ranking.refresh())
+
+    client.rows.append(
+        {'email': 'b@example.com', 'position': 2, 'referred_by': 'a@example.com', 'created_at': '2025-10-19T10:05:00+00:00'}
+    )
+    asyncio.run(ranking.refresh())
+    # Re-reading the overlap window does not credit twice
+    asyncio.run(ranking.refresh())
+
+    assert ranking.get_member("a@example.com")["referrals"] == 1
+    assert ranking.effective_position("b@example.com") == 2
+
+def test_skip_list_matches_sorted_list():
+    rng = random.Random(7)
+    skip_list = IndexableSkipList(seed=7)
+    expected = []
+    for _ in range(2000):
+        if expected and rng.random() < 0.4:
+            key = rng.choice(expected)
+            skip_list.remove(key)
+            expected.remove(key)
+        else:
+            key = rng.randint(0, 3000)
+            if key in expected:
+                continue
+            skip_list.insert(key)
+            bisect.insort(expected, key)
+
+    assert list(skip_list) == expected
+    assert all(skip_list.rank(key) == i for i, key in enumerate(expected))
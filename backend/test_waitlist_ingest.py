@@ -0,0 +1,241 @@
+from waitlist_ingest import WaitlistIngestBuffer, DuplicateEntryError
+from types import SimpleNamespace
+import asyncio
+import os
+import pytest
+
+class StubClient:
+    """Just enough of the supabase client for the ingest buffer"""
+
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+        self.last_position = max((r['position'] for r in self.rows), default=0)
+        self.fail_upserts = 0
+        self.bad_emails = set()
+        self.upserts = 0
+
+    def table(self, name):
+        return StubQuery(self)
+
+    def rpc(self, name, params):
+        self.last_position += params['block_size']
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self.last_position))
+
+class RowError(Exception):
+    code = '23514'
+
+class StubQuery:
+    def __init__(self, client):
+        self.client = client
+        self.result = []
+
+    def select(self, columns):
+        self.result = sorted(self.client.rows, key=lambda r: r['position'])
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.result = self.result[start:end + 1]
+        return self
+
+    def in_(self, column, values):
+        self.result = [r for r in self.result if r[column] in values]
+        return self
+
+    def upsert(self, rows, on_conflict, ignore_duplicates):
+        self.client.upserts += 1
+        if self.client.fail_upserts:
+            self.client.fail_upserts -= 1
+            raise ConnectionError("table unreachable")
+        if any(r['email'] in self.client.bad_emails for r in rows):
+            raise RowError("violates check constraint")
+
+        existing = {r['email'] for r in self.client.rows}
+        self.result = [dict(r) for r in rows if r['email'] not in existing]
+        self.client.rows.extend(self.result)
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.result)
+
+def row(index):
+    return {'email': f"user{index}@example.com", 'first_name': f"User{index}"}
+
+def make_buffer(client, wal_dir=None, **kwargs):
+    buffer = WaitlistIngestBuffer(
+        client, wal_dir=str(wal_dir) if wal_dir else None, position_block_size=10, **kwargs
+    )
+    buffer.inserted, buffer.duplicates, buffer.rejected = [], [], []
+    buffer.on_inserted = buffer.inserted.extend
+    buffer.on_duplicate = buffer.duplicates.extend
+    buffer.on_rejected = buffer.rejected.extend
+    return buffer
+
+def segments(wal_dir):
+    return sorted(os.listdir(wal_dir))
+
+def test_rows_are_bulk_inserted_with_reserved_positions():
+    async def run():
+        client = StubClient()
+        buffer = make_buffer(client)
+        await buffer.recover()
+        positions = [await buffer.add(row(i)) for i in range(3)]
+        await buffer.flush()
+        return client, buffer, positions
+
+    client, buffer, positions = asyncio.run(run())
+    assert positions == [1, 2, 3]
+    assert client.upserts == 1
+    assert [r['position'] for r in client.rows] == [1, 2, 3]
+    assert len(buffer.inserted) == 3
+
+def test_known_email_is_rejected():
+    async def run():
+        client = StubClient([{**row(1), 'email': 'USER1@example.com', 'position': 1}])
+        buffer = make_buffer(client)
+        await buffer.recover()
+        with pytest.raises(DuplicateEntryError):
+            await buffer.add(row(1))
+
+    asyncio.run(run())
+
+def test_crash_leftover_log_is_replayed(tmp_path):
+    client = StubClient()
+
+    async def crash():
+        buffer = make_buffer(client, tmp_path)
+        await buffer.recover()
+        await buffer.add(row(1))
+        await buffer.add(row(2))
+        # Process dies without flushing
+
+    async def restart():
+        buffer = make_buffer(client, tmp_path)
+        await buffer.recover()
+        replayed = buffer.pending_rows()
+        await buffer.flush()
+        return buffer, replayed
+
+    asyncio.run(crash())
+    with open(tmp_path / segments(tmp_path)[0], "ab") as f:
+        f.write(b'{"email": "torn')
+
+    buffer, replayed = asyncio.run(restart())
+    assert [r['position'] for r in replayed] == [1, 2]
+    assert [r['email'] for r in client.rows] == ["user1@example.com", "user2@example.com"]
+    assert len(buffer.inserted) == 2
+
+def test_flushed_segments_are_removed(tmp_path):
+    async def run():
+        buffer = make_buffer(StubClient(), tmp_path)
+        await buffer.recover()
+        await buffer.add(row(1))
+        before = segments(tmp_path)
+        await buffer.flush()
+        after = segments(tmp_path)
+        await buffer.stop()
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert len(before) == 1
+    # The flushed segment is gone and only the fresh, empty one is left
+    assert len(after) == 1 and after != before
+    assert segments(tmp_path) == []
+
+def test_failed_flush_keeps_rows_and_segments(tmp_path):
+    async def run():
+        client = StubClient()
+        client.fail_upserts = 1
+        buffer = make_buffer(client, tmp_path)
+        await buffer.recover()
+        await buffer.add(row(1))
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        kept = (buffer.pending, len(segments(tmp_path)))
+        await buffer.flush()
+        return client, buffer, kept
+
+    client, buffer, kept = asyncio.run(run())
+    assert kept == (1, 2)
+    assert [r['email'] for r in client.rows] == ["user1@example.com"]
+    assert buffer.pending == 0
+    assert len(segments(tmp_path)) == 1
+
+def test_other_writers_row_is_a_duplicate_but_replayed_row_is_not():
+    async def run():
+        client = StubClient()
+        buffer = make_buffer(client)
+        await buffer.recover()
+        await buffer.add(row(1))
+        await buffer.add(row(2))
+        # Another writer inserts user1 first; user2 was already written by an
+        # earlier attempt of this buffer, with the same position
+        client.rows.append({**row(1), 'position': 99})
+        client.rows.append({**row(2), 'position': 2})
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert [r['email'] for r in buffer.duplicates] == ["user1@example.com"]
+    assert [r['email'] for r in buffer.inserted] == ["user2@example.com"]
+
+def test_failed_fsync_rolls_back_the_join(tmp_path, monkeypatch):
+    async def run():
+        buffer = make_buffer(StubClient(), tmp_path)
+        await buffer.recover()
+
+        def broken_fsync(files):
+            raise OSError("fsync failed")
+
+        monkeypatch.setattr(buffer, "_fsync_files", broken_fsync)
+        with pytest.raises(OSError):
+            await buffer.add(row(1))
+        monkeypatch.undo()
+
+        pending = buffer.pending
+        # The email can be retried after the failure
+        await buffer.add(row(1))
+        return pending
+
+    async def restart():
+        buffer = make_buffer(StubClient(), tmp_path)
+        await buffer.recover()
+        return buffer.pending_rows()
+
+    assert asyncio.run(run()) == 0
+    # Only the retried join survives a replay
+    assert [r['position'] for r in asyncio.run(restart())] == [2]
+
+def test_rejected_row_does_not_block_the_rest():
+    async def run():
+        client = StubClient()
+        client.bad_emails = {"user2@example.com"}
+        buffer = make_buffer(client)
+        await buffer.recover()
+        for i in range(5):
+            await buffer.add(row(i))
+        await buffer.flush()
+        return client, buffer
+
+    client, buffer = asyncio.run(run())
+    assert [r['email'] for r in buffer.rejected] == ["user2@example.com"]
+    assert len(client.rows) == 4
+    assert buffer.pending == 0
+
+def test_flush_loop_backs_off_while_the_table_is_down():
+    async def run():
+        client = StubClient()
+        client.fail_upserts = 100
+        buffer = make_buffer(client, flush_interval_ms=10, max_backoff_ms=1000)
+        await buffer.start()
+        await buffer.add(row(1))
+        await asyncio.sleep(0.3)
+        buffer._stopping = True
+        buffer._flush_requested.set()
+        await buffer._flush_task
+        return client.upserts
+
+    # Without backoff a 10ms interval would retry ~30 times
+    assert asyncio.run(run()) <= 6
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Waitlist Ingestion Buffer for AI Nexus
+Buffers waitlist joins in memory (optionally backed by a local write-ahead
+log) and flushes them to Supabase as multi-row bulk inserts
+"""
+
+from typing import Optional, List, Dict, Any, Callable, Tuple
+import asyncio
+import json
+import os
+
+class DuplicateEntryError(Exception):
+    """Raised when an email is already on the waitlist or pending insert"""
+
+class WaitlistIngestBuffer:
+    """Accepts waitlist rows, acknowledges them durably and bulk-inserts them.
+
+    Positions come from blocks reserved through the
+    ``reserve_waitlist_positions`` database function, so several writers
+    (and direct inserts) never hand out the same position and a join rarely
+    needs a round trip. Emails are deduplicated against the table as loaded
+    on ``start`` plus every join this process accepted; a duplicate accepted
+    meanwhile by another writer is caught when the upsert skips it and is
+    reported through ``on_duplicate`` instead of ``on_inserted``. Rows the
+    database rejects outright (data or constraint errors) are isolated by
+    splitting the failing chunk and reported through ``on_rejected`` so they
+    cannot hold up the rest of the buffer.
+
+    When ``wal_dir`` is set, each row is fsynced to a log segment before the
+    caller is acknowledged; concurrent joins share a single fsync, and a join
+    whose fsync fails is rolled back and raises. Segments are deleted once
+    every row in them has been written to the table, and any segments left
+    over from a crash are replayed on ``start``.
+    """
+
+    def __init__(
+        self,
+        client,
+        table: str = "waitlist",
+        flush_interval_ms: int = 200,
+        max_rows: int = 500,
+        wal_dir: Optional[str] = None,
+        position_block_size: int = 50,
+        max_backoff_ms: int = 30000,
+        on_inserted: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        on_duplicate: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        on_rejected: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ):
+        self.client = client
+        self.table = table
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_rows = max_rows
+        self.wal_dir = wal_dir
+        self.position_block_size = position_block_size
+        self.max_backoff = max_backoff_ms / 1000.0
+        self.on_inserted = on_inserted
+        self.on_duplicate = on_duplicate
+        self.on_rejected = on_rejected
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._emails: set = set()
+        self._flush_requested = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+
+        # Current block of reserved positions, [_next_position, _block_end]
+        self._next_position = 1
+        self._block_end = 0
+        self._reserve_lock = asyncio.Lock()
+
+        # Write-ahead log state
+        self._segment_seq = 0
+        self._wal_file = None
+        self._wal_path: Optional[str] = None
+        self._wal_dirty = False
+        self._pending_segments: List[str] = []
+        # Segments holding rows whose fsync is still awaited; never deleted
+        self._segment_holds: Dict[str, int] = {}
+        self._retired_files: List[Any] = []
+        self._sync_waiters: List[asyncio.Future] = []
+        self._syncing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def pending_rows(self) -> List[Dict[str, Any]]:
+        """Rows accepted but not yet written to the table"""
+        return list(self._buffer)
+
+    async def start(self):
+        """Recover state and start flushing"""
+        await self.recover()
+        self.start_flushing()
+
+    async def recover(self):
+        """Seed dedup state and replay any local log, without flushing yet"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._load_existing)
+
+        if self.wal_dir:
+            os.makedirs(self.wal_dir, exist_ok=True)
+            self._replay_wal()
+            self._open_segment()
+
+    def start_flushing(self):
+        self._stopping = False
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        if self._buffer:
+            self._flush_requested.set()
+
+    async def stop(self):
+        """Flush everything still buffered and close the log"""
+        # Let an in-flight flush finish rather than cancelling it mid-insert
+        if self._flush_task:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._flush_task
+            self._flush_task = None
+
+        await self.flush()
+        await self._sync_wal()
+        if self._wal_file:
+            self._wal_file.close()
+            self._wal_file = None
+            if not self._pending_segments and not self._buffer:
+                self._remove_segment(self._wal_path)
+
+    async def add(self, row: Dict[str, Any]) -> int:
+        """Buffer a row and return its position once it is durably recorded"""
+        key = row["email"].strip().lower()
+        if key in self._emails:
+            raise DuplicateEntryError(row["email"])
+
+        self._emails.add(key)
+        try:
+            position = await self._take_position()
+            record = {**row, "position": position}
+            if self._wal_file:
+                await self._log(record, key)
+        except BaseException:
+            # Not acknowledged, so not buffered either
+            self._emails.discard(key)
+            raise
+
+        self._buffer.append(record)
+        if len(self._buffer) >= self.max_rows:
+            self._flush_requested.set()
+
+        return position
+
+    async def _take_position(self) -> int:
+        async with self._reserve_lock:
+            if self._next_position > self._block_end:
+                loop = asyncio.get_running_loop()
+                last = await loop.run_in_executor(None, self._reserve_block)
+                self._next_position = last - self.position_block_size + 1
+                self._block_end = last
+
+            position = self._next_position
+            self._next_position += 1
+            return position
+
+    def _reserve_block(self) -> int:
+        result = self.client.rpc(
+            'reserve_waitlist_positions', {'block_size': self.position_block_size}
+        ).execute()
+        return int(result.data)
+
+    async def flush(self):
+        """Bulk-insert everything currently buffered"""
+        async with self._flush_lock:
+            if not self._buffer:
+                # Replayed segments whose rows were already in the table
+                segments, self._pending_segments = self._pending_segments, []
+                self._release_segments(segments)
+                return
+
+            batch, self._buffer = self._buffer, []
+            segments = self._pending_segments
+            if self._wal_file and self._wal_dirty:
+                segments = segments + [self._wal_path]
+                self._retire_segment()
+                self._open_segment()
+            self._pending_segments = []
+
+            loop = asyncio.get_running_loop()
+            done = 0
+            try:
+                while done < len(batch):
+                    chunk = batch[done:done + self.max_rows]
+                    inserted, duplicates, rejected = await loop.run_in_executor(
+                        None, self._insert_isolating, chunk
+                    )
+                    done += len(chunk)
+                    for record in rejected:
+                        self._emails.discard(record['email'].strip().lower())
+                    self._notify(self.on_inserted, inserted)
+                    self._notify(self.on_duplicate, duplicates)
+                    self._notify(self.on_rejected, rejected)
+            except BaseException:
+                # Keep rows not yet written (and the segments holding them) for
+                # the next attempt, including when a flush is cancelled
+                self._buffer = batch[done:] + self._buffer
+                self._pending_segments = segments + self._pending_segments
+                raise
+
+            self._release_segments(segments)
+
+    def _release_segments(self, segments: List[str]):
+        for path in segments:
+            if self._segment_holds.get(path):
+                self._pending_segments.append(path)
+            else:
+                self._remove_segment(path)
+
+    @staticmethod
+    def _notify(callback, records: List[Dict[str, Any]]):
+        if not callback or not records:
+            return
+        try:
+            callback(records)
+        except Exception as e:
+            print(f"Waitlist flush callback error: {str(e)}")
+
+    async def _flush_loop(self):
+        failures = 0
+        while not self._stopping:
+            if failures:
+                # Back off while the table is failing; new rows just wait in the buffer
+                await asyncio.sleep(min(self.flush_interval * 2 ** failures, self.max_backoff))
+            else:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._flush_requested.clear()
+            if self._stopping:
+                break
+
+            try:
+                await self.flush()
+            except Exception as e:
+                failures += 1
+                if failures == 1 or failures % 10 == 0:
+                    print(f"Waitlist flush error (attempt {failures}, {self.pending} rows waiting): {str(e)}")
+                continue
+
+            if failures:
+                print(f"Waitlist flush recovered after {failures} failed attempts")
+            failures = 0
+
+    @staticmethod
+    def _is_row_error(error: Exception) -> bool:
+        """Whether the database rejected the data itself rather than being unreachable"""
+        code = getattr(error, 'code', None)
+        # Postgres classes 22 (data exception) and 23 (integrity constraint violation)
+        return isinstance(code, str) and code[:2] in ('22', '23')
+
+    def _insert_isolating(self, rows: List[Dict[str, Any]]):
+        """Insert rows, splitting the chunk to isolate rows the database rejects.
+
+        Returns (inserted, duplicates, rejected); errors other than rejected
+        data propagate so the whole batch is retried later.
+        """
+        try:
+            inserted, duplicates = self._insert_rows(rows)
+            return inserted, duplicates, []
+        except Exception as e:
+            if not self._is_row_error(e):
+                raise
+            if len(rows) == 1:
+                print(f"Waitlist row rejected for {rows[0]['email']}: {str(e)}")
+                return [], [], rows
+
+        mid = len(rows) // 2
+        first = self._insert_isolating(rows[:mid])
+        second = self._insert_isolating(rows[mid:])
+        return first[0] + second[0], first[1] + second[1], first[2] + second[2]
+
+    def _insert_rows(self, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Insert rows, returning (inserted, duplicates of another writer's rows)"""
+        # The upsert returns only the rows it inserted; the rest hit an existing email
+        result = self.client.table(self.table).upsert(
+            rows, on_conflict="email", ignore_duplicates=True
+        ).execute()
+        written = {item['email'].strip().lower() for item in result.data or []}
+        skipped = [r for r in rows if r['email'].strip().lower() not in written]
+        if not skipped:
+            return rows, []
+
+        # A row replayed from the log, or retried after a partly failed flush,
+        # may already be in the table; it then carries our position and counts
+        # as inserted rather than as a duplicate
+        existing = self.client.table(self.table).select('email, position').in_(
+            'email', [r['email'] for r in skipped]
+        ).execute()
+        positions = {
+            item['email'].strip().lower(): item.get('position')
+            for item in existing.data or []
+        }
+        inserted = [
+            r for r in rows
+            if r['email'].strip().lower() in written
+            or positions.get(r['email'].strip().lower()) == r['position']
+        ]
+        duplicates = [
+            r for r in skipped
+            if positions.get(r['email'].strip().lower()) != r['position']
+        ]
+        return inserted, duplicates
+
+    def _load_existing(self, page_size: int = 1000):
+        # Order by position so pages stay stable while new rows are appended
+        start = 0
+        while True:
+            result = self.client.table(self.table).select('email').order('position').range(
+                start, start + page_size - 1
+            ).execute()
+            rows = result.data or []
+            for item in rows:
+                self._emails.add(item['email'].strip().lower())
+            if len(rows) < page_size:
+                break
+            start += page_size
+
+    # Write-ahead log
+
+    def _segment_files(self) -> List[str]:
+        names = sorted(
+            name for name in os.listdir(self.wal_dir)
+            if name.startswith("waitlist-") and name.endswith(".wal")
+        )
+        return [os.path.join(self.wal_dir, name) for name in names]
+
+    def _replay_wal(self):
+        replayed: Dict[str, Dict[str, Any]] = {}
+        for path in self._segment_files():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash mid-append; never acknowledged
+                        continue
+                    if "cancel" in entry:
+                        # A join whose fsync failed and was rolled back
+                        record = replayed.get(entry["cancel"])
+                        if record and record["position"] == entry["position"]:
+                            del replayed[entry["cancel"]]
+                        continue
+                    key = entry["email"].strip().lower()
+                    if key not in self._emails and key not in replayed:
+                        replayed[key] = entry
+            self._pending_segments.append(path)
+
+            seq = int(os.path.basename(path)[len("waitlist-"):-len(".wal")])
+            self._segment_seq = max(self._segment_seq, seq)
+
+        self._emails.update(replayed)
+        self._buffer.extend(replayed.values())
+
+    def _write_wal(self, entry: Dict[str, Any]):
+        self._wal_file.write((json.dumps(entry) + "\n").encode("utf-8"))
+        self._wal_dirty = True
+
+    async def _log(self, record: Dict[str, Any], key: str):
+        """Append a row to the log and wait until it is fsynced"""
+        path = self._wal_path
+        self._write_wal(record)
+        self._segment_holds[path] = self._segment_holds.get(path, 0) + 1
+        try:
+            await self._wait_for_sync()
+        except BaseException:
+            # Best effort: keep a replay from inserting a join the caller was
+            # told had failed
+            try:
+                self._write_wal({"cancel": key, "position": record["position"]})
+            except Exception:
+                pass
+            raise
+        finally:
+            self._segment_holds[path] -= 1
+            if not self._segment_holds[path]:
+                del self._segment_holds[path]
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        self._wal_path = os.path.join(self.wal_dir, f"waitlist-{self._segment_seq:012d}.wal")
+        self._wal_file = open(self._wal_path, "ab")
+        self._wal_dirty = False
+
+    def _retire_segment(self):
+        # The file is closed by the next sync, after its pending appends are fsynced
+        self._retired_files.append(self._wal_file)
+        self._wal_file = None
+
+    def _remove_segment(self, path: Optional[str]):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    async def _wait_for_sync(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._sync_waiters.append(waiter)
+        if not self._syncing:
+            asyncio.create_task(self._sync_wal())
+        await waiter
+
+    async def _sync_wal(self):
+        """Group commit: one fsync acknowledges every append made before it"""
+        if self._syncing:
+            return
+        self._syncing = True
+        loop = asyncio.get_running_loop()
+        try:
+            while self._sync_waiters or self._retired_files:
+                waiters, self._sync_waiters = self._sync_waiters, []
+                retired, self._retired_files = self._retired_files, []
+                files = retired + ([self._wal_file] if self._wal_file else [])
+                try:
+                    await loop.run_in_executor(None, self._fsync_files, files)
+                except Exception as e:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                    continue
+                finally:
+                    for f in retired:
+                        f.close()
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+        finally:
+            self._syncing = False
+
+    @staticmethod
+    def _fsync_files(files: List[Any]):
+        for f in files:
+            f.flush()
+            os.fsync(f.fileno())
@@ -18,6 +18,9 @@ from email.mime.multipart import MIMEMultipart
 import os
 from supabase import create_client, Client
 
+from waitlist_ingest import WaitlistIngestBuffer, DuplicateEntryError
+from referrals import ReferralRanking
+
 app = FastAPI(
     title="AI Nexus Waitlist Service",
     description="Backend service for waitlist management",
@@ -33,9 +36,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Supabase client
+# Supabase client (service role: reserves positions and writes referral counts)
 supabase_url = os.getenv("SUPABASE_URL", "")
-supabase_key = os.getenv("SUPABASE_ANON_KEY", "")
+supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 supabase: Client = create_client(supabase_url, supabase_key)
 
 # Email configuration
@@ -45,6 +48,31 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "noreply@ainexus.com")
 
+# Ingestion configuration ("direct" inserts per join, "buffered" batches joins)
+WAITLIST_INGEST_MODE = os.getenv("WAITLIST_INGEST_MODE", "direct")
+WAITLIST_FLUSH_INTERVAL_MS = int(os.getenv("WAITLIST_FLUSH_INTERVAL_MS", "200"))
+WAITLIST_FLUSH_MAX_ROWS = int(os.getenv("WAITLIST_FLUSH_MAX_ROWS", "500"))
+WAITLIST_WAL_DIR = os.getenv("WAITLIST_WAL_DIR") or None
+WAITLIST_POSITION_BLOCK_SIZE = int(os.getenv("WAITLIST_POSITION_BLOCK_SIZE", "50"))
+
+ingest_buffer: Optional[WaitlistIngestBuffer] = None
+if WAITLIST_INGEST_MODE == "buffered":
+    ingest_buffer = WaitlistIngestBuffer(
+        supabase,
+        flush_interval_ms=WAITLIST_FLUSH_INTERVAL_MS,
+        max_rows=WAITLIST_FLUSH_MAX_ROWS,
+        wal_dir=WAITLIST_WAL_DIR,
+        position_block_size=WAITLIST_POSITION_BLOCK_SIZE
+    )
+
+# Referral ranking (effective positions and leaderboard)
+WAITLIST_REFERRAL_PERSIST_MS = int(os.getenv("WAITLIST_REFERRAL_PERSIST_MS", "5000"))
+
+referral_ranking = ReferralRanking(
+    supabase,
+    persist_interval_ms=WAITLIST_REFERRAL_PERSIST_MS
+)
+
 # Data models
 class WaitlistEntry(BaseModel):
     email: EmailStr
@@ -55,6 +83,7 @@ class WaitlistEntry(BaseModel):
     use_case: Optional[str] = None
     interests: Optional[List[str]] = []
     referral_source: Optional[str] = None
+    referred_by: Optional[str] = None
     newsletter_consent: bool = True
 
 class WaitlistResponse(BaseModel):
@@ -150,6 +179,46 @@ async def send_welcome_email(email: str, first_name: str, position: int):
     except Exception as e:
         print(f"Failed to send welcome email to {email}: {str(e)}")
 
+def welcome_inserted_members(records: List[Dict[str, Any]]):
+    """Send welcome emails once buffered joins are confirmed in the table"""
+    for record in records:
+        position = referral_ranking.effective_position(record['email']) or record['position']
+        asyncio.create_task(send_welcome_email(record['email'], record['first_name'], position))
+
+def drop_duplicate_members(records: List[Dict[str, Any]]):
+    """Forget buffered joins whose email another writer had already inserted"""
+    for record in records:
+        print(f"Waitlist join dropped, email already on waitlist: {record['email']}")
+        referral_ranking.remove_member(record['email'])
+
+def drop_rejected_members(records: List[Dict[str, Any]]):
+    """Forget buffered joins the table refused to store"""
+    for record in records:
+        print(f"Waitlist join rejected by the database, dropped: {json.dumps(record, default=str)}")
+        referral_ranking.remove_member(record['email'])
+
+@app.on_event("startup")
+async def start_ingest_buffer():
+    """Load rankings, replay any unflushed joins and start the bulk insert loop"""
+    await referral_ranking.start()
+    if ingest_buffer:
+        ingest_buffer.on_inserted = welcome_inserted_members
+        ingest_buffer.on_duplicate = drop_duplicate_members
+        ingest_buffer.on_rejected = drop_rejected_members
+        await ingest_buffer.recover()
+        # Joins replayed from the local log are not in the table yet; rank them
+        # before the flush loop can report them inserted or duplicated
+        for row in ingest_buffer.pending_rows():
+            referral_ranking.add_member(row['email'], row['position'], row.get('referred_by'))
+        ingest_buffer.start_flushing()
+
+@app.on_event("shutdown")
+async def stop_ingest_buffer():
+    """Flush buffered joins before the process exits"""
+    if ingest_buffer:
+        await ingest_buffer.stop()
+    await referral_ranking.stop()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -172,8 +241,7 @@ async def join_waitlist(
         client_ip = request.client.host
         user_agent = request.headers.get("user-agent", "")
 
-        # Insert into Supabase
-        result = supabase.table('waitlist').insert({
+        row = {
             'email': entry.email,
             'first_name': entry.first_name,
             'last_name': entry.last_name,
@@ -182,33 +250,57 @@ async def join_waitlist(
             'use_case': entry.use_case,
             'interests': entry.interests,
             'referral_source': entry.referral_source,
+            'referred_by': await referral_ranking.resolve_referrer(entry.referred_by, entry.email),
             'newsletter_consent': entry.newsletter_consent,
             'ip_address': client_ip,
             'user_agent': user_agent
-        }).execute()
+        }
+
+        if ingest_buffer:
+            # Position is reserved up front; the row is bulk-inserted later and
+            # the welcome email goes out once the insert is confirmed
+            position = await ingest_buffer.add(row)
+            position = referral_ranking.add_member(entry.email, position, row['referred_by'])
+
+            return WaitlistResponse(
+                success=True,
+                message="Successfully joined the waitlist!",
+                position=position
+            )
+
+        # Insert into Supabase
+        result = supabase.table('waitlist').insert(row).execute()
 
         if result.data:
             # Get total count for position
             count_result = supabase.table('waitlist').select('*', count='exact').execute()
             total_count = count_result.count or 1
+            position = referral_ranking.add_member(
+                entry.email,
+                result.data[0].get('position') or total_count,
+                row['referred_by'],
+                result.data[0].get('created_at')
+            )
             
             # Send welcome email in background
             background_tasks.add_task(
                 send_welcome_email, 
                 entry.email, 
                 entry.first_name, 
-                total_count
+                position
             )
 
             return WaitlistResponse(
                 success=True,
                 message="Successfully joined the waitlist!",
-                position=total_count,
+                position=position,
                 total_count=total_count
             )
         else:
             raise HTTPException(status_code=400, detail="Failed to join waitlist")
 
+    except DuplicateEntryError:
+        raise HTTPException(status_code=409, detail="Email already on waitlist")
     except Exception as e:
         if "duplicate key value" in str(e).lower():
             raise HTTPException(status_code=409, detail="Email already on waitlist")
@@ -265,9 +357,37 @@ async def get_waitlist_stats():
         print(f"Stats error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch statistics")
 
+@app.get("/waitlist/leaderboard")
+async def get_referral_leaderboard(limit: int = 10):
+    """Get top referrers"""
+    limit = max(1, min(limit, 100))
+    return {
+        "leaderboard": [
+            {**item, "email": mask_email(item["email"])}
+            for item in referral_ranking.top(limit)
+        ],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def mask_email(email: str) -> str:
+    """Hide most of the local part of an email for public listings"""
+    local, _, domain = email.partition('@')
+    return f"{local[:2]}***@{domain}"
+
 @app.get("/waitlist/position/{email}")
 async def get_waitlist_position(email: str):
     """Get user's position in waitlist"""
+    member = referral_ranking.get_member(email)
+    if member:
+        return {
+            "email": email,
+            "position": member["effective_position"],
+            "original_position": member["position"],
+            "referrals": member["referrals"],
+            "joined_at": member["joined_at"],
+            "status": "found"
+        }
+
     try:
         result = supabase.table('waitlist').select('position, created_at').eq('email', email).single().execute()
         
@@ -400,6 +520,11 @@ async def health_check():
             "api": "running",
             "database": "connected",
             "email": "configured" if SMTP_USERNAME else "not_configured"
+        },
+        "ingest": {
+            "mode": "buffered" if ingest_buffer else "direct",
+            "pending_rows": ingest_buffer.pending if ingest_buffer else 0,
+            "wal": "enabled" if WAITLIST_WAL_DIR else "disabled"
         }
     }
 
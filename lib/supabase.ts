@@ -75,7 +75,7 @@ export type Database = {
           agent_id: string;
           latency_ms: number;
           cost_usd: number;
-          accuracy_score: number;
+          accuracy_score: number | null;
           created_at: string;
         };
         Insert: {
@@ -83,7 +83,7 @@ export type Database = {
           agent_id: string;
           latency_ms: number;
           cost_usd: number;
-          accuracy_score: number;
+          accuracy_score?: number | null;
           created_at?: string;
         };
         Update: {
@@ -91,7 +91,7 @@ export type Database = {
           agent_id?: string;
           latency_ms?: number;
           cost_usd?: number;
-          accuracy_score?: number;
+          accuracy_score?: number | null;
           created_at?: string;
         };
       };
@@ -158,6 +158,7 @@ export type Database = {
           use_case: string | null;
           interests: string[] | null;
           referral_source: string | null;
+          referred_by: string | null;
           newsletter_consent: boolean;
           position: number | null;
           ip_address: string | null;
@@ -178,6 +179,7 @@ export type Database = {
           use_case?: string | null;
           interests?: string[] | null;
           referral_source?: string | null;
+          referred_by?: string | null;
           newsletter_consent?: boolean;
           position?: number | null;
           ip_address?: string | null;
@@ -198,6 +200,7 @@ export type Database = {
           use_case?: string | null;
           interests?: string[] | null;
           referral_source?: string | null;
+          referred_by?: string | null;
           newsletter_consent?: boolean;
           position?: number | null;
           ip_address?: string | null;
@@ -0,0 +1,14 @@
+/*
+  # Precise Benchmark Metrics
+
+  1. Changes
+    - `benchmarks.latency_ms` becomes numeric so sub-millisecond wall-clock
+      measurements are stored as measured instead of rounded to 0
+    - `benchmarks.accuracy_score` becomes nullable; it is null for agents
+      without a sample_input/sample_output pair to score against
+*/
+
+ALTER TABLE benchmarks ALTER COLUMN latency_ms TYPE numeric;
+
+ALTER TABLE benchmarks ALTER COLUMN accuracy_score DROP NOT NULL;
+ALTER TABLE benchmarks ALTER COLUMN accuracy_score DROP DEFAULT;
@@ -0,0 +1,72 @@
+/*
+  # Buffered Waitlist Ingestion
+
+  1. New Tables
+    - `waitlist_position_counter`
+      - `id` (boolean, primary key) - Single-row guard
+      - `last_position` (bigint) - Highest position handed out so far
+
+  2. New Functions
+    - `reserve_waitlist_positions(block_size)` - Atomically reserves the next
+      `block_size` positions and returns the last one
+      - Used by buffered waitlist writers to assign positions ahead of their
+        multi-row bulk inserts without colliding with other writers
+
+  3. Changes
+    - `assign_waitlist_position` reserves positions from the counter instead
+      of MAX(position) + 1, and keeps a supplied position only when the
+      inserter is the service role (the buffered waitlist service)
+
+  4. Security
+    - Enable RLS on `waitlist_position_counter`; it is only changed through
+      `reserve_waitlist_positions`
+    - `reserve_waitlist_positions` is executable by the service role only and
+      rejects block sizes outside 1..1000
+*/
+
+-- Create position counter seeded from existing rows
+CREATE TABLE IF NOT EXISTS waitlist_position_counter (
+  id boolean PRIMARY KEY DEFAULT true CHECK (id),
+  last_position bigint NOT NULL DEFAULT 0
+);
+
+ALTER TABLE waitlist_position_counter ENABLE ROW LEVEL SECURITY;
+
+INSERT INTO waitlist_position_counter (id, last_position)
+SELECT true, COALESCE(MAX(position), 0) FROM waitlist
+ON CONFLICT (id) DO NOTHING;
+
+-- Reserve a contiguous block of positions
+CREATE OR REPLACE FUNCTION reserve_waitlist_positions(block_size integer)
+RETURNS bigint AS $$
+DECLARE
+  reserved bigint;
+BEGIN
+  IF block_size IS NULL OR block_size < 1 OR block_size > 1000 THEN
+    RAISE EXCEPTION 'block_size must be between 1 and 1000, got %', block_size;
+  END IF;
+
+  UPDATE waitlist_position_counter
+  SET last_position = last_position + block_size
+  WHERE id
+  RETURNING last_position INTO reserved;
+
+  RETURN reserved;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION reserve_waitlist_positions(integer) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION reserve_waitlist_positions(integer) TO service_role;
+
+CREATE OR REPLACE FUNCTION assign_waitlist_position()
+RETURNS TRIGGER AS $$
+BEGIN
+  -- Only the service role may supply a position (reserved ahead of time by
+  -- buffered ingestion); anyone else is placed at the back of the queue
+  IF NEW.position IS NULL OR COALESCE(auth.role(), '') <> 'service_role' THEN
+    NEW.position := reserve_waitlist_positions(1);
+  END IF;
+  
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
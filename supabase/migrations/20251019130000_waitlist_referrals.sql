@@ -0,0 +1,79 @@
+/*
+  # Waitlist Referrals
+
+  1. Changes
+    - `waitlist.referred_by` (text, nullable) - Email of the member whose
+      referral link brought this signup
+
+  2. New Tables
+    - `waitlist_referrals`
+      - `referrer_email` (text, primary key) - Member credited with referrals
+      - `referral_count` (integer) - Signups attributed to the member
+      - `updated_at` (timestamptz) - When the count was last persisted
+
+  3. New Functions
+    - `normalize_waitlist_referrer()` - Trigger that lowercases `referred_by`
+      and clears it unless it names another member already on the waitlist,
+      whichever writer inserts the row
+    - `waitlist_member_exists(candidate)` - Whether an email (lowercase) is on
+      the waitlist; used by the waitlist service for referrers it has not
+      loaded yet
+
+  4. Security
+    - Enable RLS on `waitlist_referrals` with no policies: only the service
+      role (which bypasses RLS) reads and writes counts, and the public
+      leaderboard is served with masked emails by the waitlist service
+    - `waitlist_member_exists` is executable by the service role only
+
+  5. Indexes
+    - Add index on `waitlist.referred_by`
+    - Add index on `lower(waitlist.email)` for referrer lookups
+*/
+
+ALTER TABLE waitlist ADD COLUMN IF NOT EXISTS referred_by text;
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_referred_by ON waitlist(referred_by);
+CREATE INDEX IF NOT EXISTS idx_waitlist_email_lower ON waitlist(lower(email));
+
+-- Only keep referrals to existing members, stored in normalized form
+CREATE OR REPLACE FUNCTION normalize_waitlist_referrer()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.referred_by := NULLIF(lower(trim(NEW.referred_by)), '');
+
+  IF NEW.referred_by IS NOT NULL AND (
+    NEW.referred_by = lower(trim(NEW.email))
+    OR NOT EXISTS (SELECT 1 FROM waitlist WHERE lower(email) = NEW.referred_by)
+  ) THEN
+    NEW.referred_by := NULL;
+  END IF;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS trigger_normalize_waitlist_referrer ON waitlist;
+CREATE TRIGGER trigger_normalize_waitlist_referrer
+  BEFORE INSERT ON waitlist
+  FOR EACH ROW
+  EXECUTE FUNCTION normalize_waitlist_referrer();
+
+CREATE OR REPLACE FUNCTION waitlist_member_exists(candidate text)
+RETURNS boolean AS $$
+  SELECT EXISTS (SELECT 1 FROM waitlist WHERE lower(email) = candidate);
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION waitlist_member_exists(text) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION waitlist_member_exists(text) TO service_role;
+
+-- Create waitlist_referrals table
+CREATE TABLE IF NOT EXISTS waitlist_referrals (
+  referrer_email text PRIMARY KEY,
+  referral_count integer NOT NULL DEFAULT 0,
+  updated_at timestamptz DEFAULT now()
+);
+
+-- Enable Row Level Security; without policies only the service role has access
+ALTER TABLE waitlist_referrals ENABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_referrals_count ON waitlist_referrals(referral_count DESC);